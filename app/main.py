@@ -3,19 +3,36 @@ FastAPI backend for SpendShield AI
 Provides REST API endpoints for document analysis and audit retrieval
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import os
 import uuid
-import shutil
+import asyncio
+import hashlib
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from contextlib import asynccontextmanager
 
+import aiofiles
+import aiofiles.os
+import orjson
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
 from app.db import db
-from app.graph import get_compiled_graph
+from app.graph import get_compiled_graph, new_document_hasher, run_audit, warm_graph
+from app.tasks import BATCH_WINDOW, BROKER_URL, PUBLISH_TIMEOUT, analyze_batcher
 
 
 # Pydantic models
@@ -45,25 +62,122 @@ class AuditResponse(BaseModel):
     errors: List[str]
 
 
+# Response cache: only completed audits are final; anything else (including
+# 'failed', which the reporter can still turn into 'completed') is cached
+# only briefly so pollers see new nodes quickly
+REDIS_URL = os.getenv("REDIS_URL")
+AUDIT_CACHE_PREFIX = "api:audit:"
+AUDITS_CACHE_PREFIX = "api:audits:"
+AUDIT_PROCESSING_TTL = 5
+AUDIT_FINAL_TTL = 3600
+AUDITS_LIST_TTL = 10
+
+redis_client = None
+
+
+def etag_response(request: Request, body: bytes) -> Response:
+    """JSON response tagged with a body hash; 304 when the client already has it"""
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """Read a cached response body; None when missing or Redis is unavailable"""
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(key)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis read failed for {key}: {str(e)}")
+        return None
+
+
+async def cache_set(key: str, body: bytes, ttl: int):
+    """Store a response body for ttl seconds"""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(key, body, ex=ttl)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis write failed for {key}: {str(e)}")
+
+
+async def cache_delete(key: str):
+    """Drop a cached response body"""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.delete(key)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis delete failed for {key}: {str(e)}")
+
+
+def setup_logging() -> QueueListener:
+    """
+    Route root logging through a queue so formatting and stdout writes happen
+    on the listener's thread instead of the event loop
+    """
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    ))
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
 # Application lifecycle
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application startup and shutdown"""
     # Startup
-    print("🚀 Starting SpendShield AI...")
+    log_listener = setup_logging()
+    logger.info("🚀 Starting SpendShield AI...")
     await db.initialize()
-    print("✅ Database initialized")
+    logger.info("✅ Database initialized")
+    
+    # Compile the workflow once; request handlers reuse app.state.graph
+    app.state.graph = get_compiled_graph()
+    logger.info("✅ Fraud detection graph compiled")
+    try:
+        await warm_graph(app.state.graph)
+        logger.info("✅ Graph, model client and connection pool warmed up")
+    except Exception as e:
+        logger.warning(f"⚠️ Warmup failed, first request will be cold: {str(e)}")
     
     # Ensure upload directory exists
     os.makedirs("uploads", exist_ok=True)
-    print("✅ Upload directory ready")
+    logger.info("✅ Upload directory ready")
+    
+    if BROKER_URL:
+        analyze_batcher.start()
+        logger.info("✅ Celery batch producer started")
+    
+    global redis_client
+    if REDIS_URL:
+        if REDIS_AVAILABLE:
+            redis_client = aioredis.from_url(REDIS_URL)
+            logger.info("✅ Redis response cache enabled")
+        else:
+            logger.warning("⚠️ REDIS_URL is set but the redis package is not installed")
     
     yield
     
     # Shutdown
-    print("🛑 Shutting down SpendShield AI...")
+    logger.info("🛑 Shutting down SpendShield AI...")
+    if BROKER_URL:
+        await analyze_batcher.stop()
+    if redis_client is not None:
+        await redis_client.close()
     await db.close()
-    print("✅ Database connections closed")
+    logger.info("✅ Database connections closed")
+    log_listener.stop()
 
 
 # Initialize FastAPI app
@@ -71,7 +185,8 @@ app = FastAPI(
     title="SpendShield AI",
     description="Autonomous fraud detection system for public expenditure",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -84,6 +199,30 @@ app.add_middleware(
 )
 
 
+# Upload limits
+ALLOWED_EXTENSIONS = frozenset({'.pdf', '.png', '.jpg', '.jpeg'})
+INVALID_TYPE_DETAIL = f"Invalid file type. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+TOO_LARGE_DETAIL = "File too large. Maximum size: 10MB"
+# Headroom for multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+# Upload size guard
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject uploads whose declared Content-Length is over the limit before the
+    multipart body is read; bodies without one are capped while streaming
+    """
+    if request.method == "POST":
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+            return ORJSONResponse(status_code=413, content={"detail": TOO_LARGE_DETAIL})
+    return await call_next(request)
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -95,9 +234,34 @@ async def health_check():
     }
 
 
+async def save_upload(file: UploadFile, file_path: str) -> str:
+    """
+    Stream an upload to disk in 1 MiB chunks without blocking the event loop,
+    enforcing the size limit and hashing the bytes on the way through
+    
+    Returns:
+        Document hash used by the extractor's result cache
+    """
+    size = 0
+    digest = new_document_hasher()
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except HTTPException:
+        await aiofiles.os.remove(file_path)
+        raise
+    return digest.hexdigest()
+
+
 # Main analysis endpoint
 @app.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_document(
+    request: Request,
     file: UploadFile = File(...),
     department: Optional[str] = Form(None),
     fiscal_year: Optional[int] = Form(None)
@@ -115,25 +279,12 @@ async def analyze_document(
     """
     
     # Validate file type
-    allowed_extensions = {'.pdf', '.png', '.jpg', '.jpeg'}
     file_ext = os.path.splitext(file.filename)[1].lower()
     
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
-        )
-    
-    # Validate file size (10MB limit)
-    max_size = 10 * 1024 * 1024  # 10MB
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-    
-    if file_size > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: 10MB"
+            detail=INVALID_TYPE_DETAIL
         )
     
     try:
@@ -146,57 +297,59 @@ async def analyze_document(
         
         file_path = os.path.join(upload_dir, f"{thread_id}{file_ext}")
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"📄 File uploaded: {file_path}")
-        
-        # Initialize state
-        initial_state = {
-            "document_path": file_path,
-            "thread_id": thread_id,
-            "extracted_data": None,
-            "extraction_reasoning": "",
-            "verification_result": None,
-            "verification_reasoning": "",
-            "anomalies": [],
-            "anomaly_reasoning": "",
-            "fraud_risk_score": 0.0,
-            "final_report": "",
-            "recommendations": [],
-            "current_node": "",
-            "errors": [],
-            "processing_time": 0.0
-        }
+        # Size is enforced while streaming, so oversized uploads stop early
+        document_hash = await save_upload(file, file_path)
         
-        # Get compiled graph
-        graph = get_compiled_graph()
+        logger.info(f"📄 File uploaded: {file_path}")
         
-        # Run the graph asynchronously
-        config = {"configurable": {"thread_id": thread_id}}
+        # With a broker configured the graph runs on a Celery worker and
+        # clients poll /audit/{thread_id}; without one it runs inline
+        if BROKER_URL:
+            # Only answer "queued" once the broker holds the job; a failed
+            # publish surfaces as a 500 below. A stalled one may still go
+            # through, so the client gets 202 and the thread_id to poll rather
+            # than an error that invites a duplicate resubmission
+            published = await analyze_batcher.submit(thread_id, file_path, document_hash)
+            try:
+                await asyncio.wait_for(asyncio.shield(published), BATCH_WINDOW + PUBLISH_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Broker slow to accept - Thread: {thread_id}")
+                return ORJSONResponse(status_code=202, content={
+                    "thread_id": thread_id,
+                    "status": "pending",
+                    "message": f"Analysis is still being queued. Poll /audit/{thread_id} for progress"
+                })
+            logger.info(f"📨 Analysis queued - Thread: {thread_id}")
+            
+            return AnalyzeResponse.model_construct(
+                thread_id=thread_id,
+                status="queued",
+                message=f"Analysis queued. Poll /audit/{thread_id} for progress"
+            )
         
-        # Start processing in background (for production, use task queue like Celery)
-        # For now, we'll process synchronously
         start_time = datetime.now()
         
-        final_state = None
-        async for state in graph.astream(initial_state, config):
-            final_state = state
-            print(f"📊 Current node: {list(state.keys())}")
+        await run_audit(
+            file_path, thread_id, graph=request.app.state.graph,
+            document_hash=document_hash
+        )
+        await cache_delete(f"{AUDIT_CACHE_PREFIX}{thread_id}")
         
         end_time = datetime.now()
         processing_time = (end_time - start_time).total_seconds()
         
-        print(f"✅ Analysis complete in {processing_time:.2f}s - Thread: {thread_id}")
+        logger.info(f"✅ Analysis complete in {processing_time:.2f}s - Thread: {thread_id}")
         
-        return AnalyzeResponse(
+        return AnalyzeResponse.model_construct(
             thread_id=thread_id,
             status="completed",
             message=f"Analysis completed in {processing_time:.2f} seconds"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error processing document: {str(e)}")
+        logger.error(f"❌ Error processing document: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing document: {str(e)}"
@@ -205,7 +358,7 @@ async def analyze_document(
 
 # Audit retrieval endpoint
 @app.get("/audit/{thread_id}", response_model=AuditResponse)
-async def get_audit(thread_id: str):
+async def get_audit(thread_id: str, request: Request):
     """
     Retrieve audit state and history for a specific thread
     
@@ -216,15 +369,28 @@ async def get_audit(thread_id: str):
         AuditResponse with complete audit information
     """
     
+    cache_key = f"{AUDIT_CACHE_PREFIX}{thread_id}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return etag_response(request, cached)
+    
     try:
-        # Get compiled graph
-        graph = get_compiled_graph()
+        graph = request.app.state.graph
         
         # Get state from checkpoint
         config = {"configurable": {"thread_id": thread_id}}
         
-        # Get the latest state
-        state = graph.get_state(config)
+        # Read the latest checkpoint and the thread's flags concurrently; the
+        # checkpointer is synchronous, so its read runs in a worker thread
+        # unless the graph offers an async variant
+        if hasattr(graph, "aget_state"):
+            state_read = graph.aget_state(config)
+        else:
+            state_read = asyncio.to_thread(graph.get_state, config)
+        state, flags = await asyncio.gather(
+            state_read,
+            db.get_flags_by_thread(thread_id)
+        )
         
         if not state or not state.values:
             raise HTTPException(
@@ -234,12 +400,11 @@ async def get_audit(thread_id: str):
         
         state_values = state.values
         
-        # Get flags from database
-        flags = await db.get_flags_by_thread(thread_id)
-        
         # Convert anomalies to response format
+        # Checkpointed state was produced by our own nodes, so the response
+        # models are built without re-validating every field
         anomalies = [
-            AnomalyResponse(
+            AnomalyResponse.model_construct(
                 flag_type=a['flag_type'],
                 severity=a['severity'],
                 description=a['description'],
@@ -257,7 +422,7 @@ async def get_audit(thread_id: str):
         else:
             status = 'processing'
         
-        return AuditResponse(
+        audit = AuditResponse.model_construct(
             thread_id=thread_id,
             status=status,
             current_node=current_node,
@@ -270,10 +435,16 @@ async def get_audit(thread_id: str):
             errors=state_values.get('errors', [])
         )
         
+        body = audit.model_dump_json().encode()
+        ttl = AUDIT_FINAL_TTL if status == 'completed' else AUDIT_PROCESSING_TTL
+        await cache_set(cache_key, body, ttl)
+        
+        return etag_response(request, body)
+        
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error retrieving audit: {str(e)}")
+        logger.error(f"❌ Error retrieving audit: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving audit: {str(e)}"
@@ -282,7 +453,7 @@ async def get_audit(thread_id: str):
 
 # List all audits endpoint
 @app.get("/audits")
-async def list_audits(limit: int = 10):
+async def list_audits(request: Request, limit: int = 10):
     """
     List recent audits
     
@@ -293,24 +464,16 @@ async def list_audits(limit: int = 10):
         List of recent audit summaries
     """
     
+    cache_key = f"{AUDITS_CACHE_PREFIX}{limit}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return etag_response(request, cached)
+    
     try:
-        # Query flags table for recent audits
-        async with db.pool.connection() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute("""
-                    SELECT DISTINCT ON (thread_id)
-                        thread_id,
-                        fraud_risk_score,
-                        flagged_at,
-                        COUNT(*) OVER (PARTITION BY thread_id) as anomaly_count
-                    FROM flags
-                    ORDER BY thread_id, flagged_at DESC
-                    LIMIT %s
-                """, (limit,))
-                
-                audits = await cur.fetchall()
+        # Per-thread summaries are maintained as flags are saved
+        audits = await db.get_recent_audits(limit)
         
-        return {
+        result = {
             "audits": [
                 {
                     "thread_id": audit['thread_id'],
@@ -322,29 +485,38 @@ async def list_audits(limit: int = 10):
             ]
         }
         
+        body = orjson.dumps(result)
+        await cache_set(cache_key, body, AUDITS_LIST_TTL)
+        
+        return etag_response(request, body)
+        
     except Exception as e:
-        print(f"❌ Error listing audits: {str(e)}")
+        logger.error(f"❌ Error listing audits: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error listing audits: {str(e)}"
         )
 
 
+# Static service description, serialized once at import
+ROOT_INFO_JSON = orjson.dumps({
+    "service": "SpendShield AI",
+    "version": "1.0.0",
+    "description": "Autonomous fraud detection system for public expenditure",
+    "endpoints": {
+        "POST /analyze": "Upload document for fraud analysis",
+        "GET /audit/{thread_id}": "Retrieve audit results",
+        "GET /audits": "List recent audits",
+        "GET /health": "Health check"
+    }
+})
+
+
 # Root endpoint
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
-        "service": "SpendShield AI",
-        "version": "1.0.0",
-        "description": "Autonomous fraud detection system for public expenditure",
-        "endpoints": {
-            "POST /analyze": "Upload document for fraud analysis",
-            "GET /audit/{thread_id}": "Retrieve audit results",
-            "GET /audits": "List recent audits",
-            "GET /health": "Health check"
-        }
-    }
+    return Response(content=ROOT_INFO_JSON, media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -352,9 +524,26 @@ if __name__ == "__main__":
     
     port = int(os.getenv("PORT", 8080))
     
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True
-    )
+    if os.getenv("ENV") == "dev":
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True
+        )
+    else:
+        # State lives in Postgres (and Redis), so every core can serve requests;
+        # graph runs go to Celery workers when BROKER_URL is set
+        workers = int(os.getenv("WORKERS", os.cpu_count() or 1))
+        # Worker processes inherit the environment and size their database
+        # pools to a 1/workers share of PG_POOL_MIN/PG_POOL_MAX
+        os.environ["WORKERS"] = str(workers)
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=port,
+            workers=workers,
+            loop="uvloop",
+            http="httptools",
+            access_log=False
+        )
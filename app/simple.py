@@ -5,20 +5,41 @@ This version runs without PostgreSQL for quick testing
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from datetime import datetime
 import os
 
+import orjson
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SpendShield AI",
     description="Autonomous fraud detection system for public expenditure",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Browsers may reuse dashboard assets for an hour; StaticFiles already sends
+# ETag/Last-Modified, so stale copies revalidate with a 304
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that adds a Cache-Control header to every response"""
+    
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        response.headers.setdefault("Cache-Control", STATIC_CACHE_CONTROL)
+        return response
+
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static", check_dir=True), name="static")
+
+# Compress text responses (dashboard HTML/JS/CSS and JSON) above 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # CORS middleware
 app.add_middleware(
@@ -29,6 +50,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Static payloads, serialized once at import
+API_INFO_JSON = orjson.dumps({
+    "service": "SpendShield AI",
+    "version": "1.0.0 (Simplified)",
+    "description": "Autonomous fraud detection system for public expenditure",
+    "status": "Running without database",
+    "endpoints": {
+        "GET /": "Interactive Dashboard",
+        "GET /api": "API information",
+        "GET /health": "Health check",
+        "GET /demo": "Fraud detection demo",
+        "GET /docs": "API documentation"
+    },
+    "setup_instructions": {
+        "full_version": "To run the full version with database:",
+        "steps": [
+            "1. Install PostgreSQL or Docker",
+            "2. Start PostgreSQL on port 5432",
+            "3. Run the full application with: python -m uvicorn app.main:app --reload"
+        ]
+    }
+})
+
+DEMO_JSON = orjson.dumps({
+    "scenario": "Mock Invoice Analysis",
+    "document": {
+        "vendor": "QuickFix Solutions Ltd",
+        "vendor_id": "VND005",
+        "invoice_number": "INV-2024-500",
+        "amount": 50000.00,
+        "item": "Office supplies",
+        "quantity": 1000,
+        "unit_price": 50.00
+    },
+    "analysis": {
+        "step_1_extraction": {
+            "status": "✅ Complete",
+            "agent": "Extractor",
+            "result": "Document successfully extracted"
+        },
+        "step_2_verification": {
+            "status": "✅ Complete",
+            "agent": "Verifier",
+            "vendor_exists": False,
+            "historical_avg_price": 40.00
+        },
+        "step_3_anomaly_detection": {
+            "status": "✅ Complete",
+            "agent": "Anomaly Detector",
+            "anomalies": [
+                {
+                    "type": "ghost_vendor",
+                    "severity": "CRITICAL",
+                    "description": "Vendor not found in database"
+                },
+                {
+                    "type": "price_inflation",
+                    "severity": "HIGH",
+                    "description": "25% price inflation detected",
+                    "current_price": 50.00,
+                    "historical_avg": 40.00,
+                    "inflation_pct": 25.0
+                }
+            ]
+        },
+        "step_4_reporting": {
+            "status": "✅ Complete",
+            "agent": "Reporter",
+            "fraud_risk_score": 65,
+            "risk_level": "HIGH",
+            "recommendation": "REJECT & INVESTIGATE"
+        }
+    },
+    "recommendations": [
+        "Verify the legitimacy of QuickFix Solutions Ltd",
+        "Investigate the 25% price inflation",
+        "Suspend payment pending investigation",
+        "Strengthen procurement controls"
+    ]
+})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -44,95 +146,20 @@ async def health_check():
 @app.get("/")
 async def dashboard():
     """Serve the interactive dashboard"""
-    return FileResponse("static/index.html")
+    # The shell always revalidates so new asset references are picked up
+    return FileResponse("static/index.html", headers={"Cache-Control": "no-cache"})
 
 # API Info endpoint
 @app.get("/api")
 async def api_info():
     """API information endpoint"""
-    return {
-        "service": "SpendShield AI",
-        "version": "1.0.0 (Simplified)",
-        "description": "Autonomous fraud detection system for public expenditure",
-        "status": "Running without database",
-        "endpoints": {
-            "GET /": "Interactive Dashboard",
-            "GET /api": "API information",
-            "GET /health": "Health check",
-            "GET /demo": "Fraud detection demo",
-            "GET /docs": "API documentation"
-        },
-        "setup_instructions": {
-            "full_version": "To run the full version with database:",
-            "steps": [
-                "1. Install PostgreSQL or Docker",
-                "2. Start PostgreSQL on port 5432",
-                "3. Run the full application with: python -m uvicorn app.main:app --reload"
-            ]
-        }
-    }
+    return Response(content=API_INFO_JSON, media_type="application/json")
 
 # Demo endpoint
 @app.get("/demo")
 async def demo():
     """Fraud detection demo"""
-    return {
-        "scenario": "Mock Invoice Analysis",
-        "document": {
-            "vendor": "QuickFix Solutions Ltd",
-            "vendor_id": "VND005",
-            "invoice_number": "INV-2024-500",
-            "amount": 50000.00,
-            "item": "Office supplies",
-            "quantity": 1000,
-            "unit_price": 50.00
-        },
-        "analysis": {
-            "step_1_extraction": {
-                "status": "✅ Complete",
-                "agent": "Extractor",
-                "result": "Document successfully extracted"
-            },
-            "step_2_verification": {
-                "status": "✅ Complete",
-                "agent": "Verifier",
-                "vendor_exists": False,
-                "historical_avg_price": 40.00
-            },
-            "step_3_anomaly_detection": {
-                "status": "✅ Complete",
-                "agent": "Anomaly Detector",
-                "anomalies": [
-                    {
-                        "type": "ghost_vendor",
-                        "severity": "CRITICAL",
-                        "description": "Vendor not found in database"
-                    },
-                    {
-                        "type": "price_inflation",
-                        "severity": "HIGH",
-                        "description": "25% price inflation detected",
-                        "current_price": 50.00,
-                        "historical_avg": 40.00,
-                        "inflation_pct": 25.0
-                    }
-                ]
-            },
-            "step_4_reporting": {
-                "status": "✅ Complete",
-                "agent": "Reporter",
-                "fraud_risk_score": 65,
-                "risk_level": "HIGH",
-                "recommendation": "REJECT & INVESTIGATE"
-            }
-        },
-        "recommendations": [
-            "Verify the legitimacy of QuickFix Solutions Ltd",
-            "Investigate the 25% price inflation",
-            "Suspend payment pending investigation",
-            "Strengthen procurement controls"
-        ]
-    }
+    return Response(content=DEMO_JSON, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -154,9 +181,22 @@ if __name__ == "__main__":
     print("=" * 80)
     print()
     
-    uvicorn.run(
-        "app.simple:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True
-    )
+    # Quick testing reloads on edits; setting WORKERS opts into a
+    # multi-process uvloop server instead
+    if os.getenv("WORKERS"):
+        uvicorn.run(
+            "app.simple:app",
+            host="0.0.0.0",
+            port=port,
+            workers=int(os.getenv("WORKERS")),
+            loop="uvloop",
+            http="httptools",
+            access_log=False
+        )
+    else:
+        uvicorn.run(
+            "app.simple:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True
+        )
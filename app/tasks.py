@@ -0,0 +1,205 @@
+"""
+Celery worker for SpendShield AI
+Runs the fraud detection graph outside the API process
+
+Start a worker with:
+    celery -A app.tasks worker -Q analyze
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from app.db import db
+from app.graph import run_audit, warm_graph
+
+
+logger = logging.getLogger(__name__)
+
+BROKER_URL = os.getenv("BROKER_URL")
+
+celery_app = Celery("spendshield", broker=BROKER_URL)
+celery_app.conf.update(
+    # A single queue keeps brokers that poll per queue from adding latency
+    task_default_queue="analyze",
+    worker_concurrency=int(os.getenv("CELERY_CONCURRENCY", 16)),
+    worker_prefetch_multiplier=16,
+    broker_transport_options={"polling_interval": 0.5},
+    task_acks_late=True,
+    task_ignore_result=True,
+)
+
+# Documents queued within one window go to a worker as a single task; the
+# worker runs them concurrently, bounded to protect Gemini rate limits
+BATCH_MAX = int(os.getenv("ANALYZE_BATCH_MAX", 8))
+BATCH_WINDOW = float(os.getenv("ANALYZE_BATCH_WINDOW_MS", 200)) / 1000
+BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", 8))
+# How long /analyze waits for its batch to reach the broker
+PUBLISH_TIMEOUT = float(os.getenv("ANALYZE_PUBLISH_TIMEOUT", 5))
+
+# One event loop per worker process, so the database pool outlives a task.
+# Prefork children create it in worker_process_init; the solo and threads
+# pools never send that signal, so the first task creates it instead, and
+# the lock keeps thread-pool tasks from driving the loop concurrently
+_loop: asyncio.AbstractEventLoop = None
+_loop_lock = threading.Lock()
+
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    """Open the database pool once in each worker process"""
+    global _loop
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    # The API owns schema creation and seeding; every prefork child running
+    # them at once would race on the DDL. The children also split the
+    # host's connection budget between them
+    _loop.run_until_complete(db.initialize(
+        migrate=False, processes=celery_app.conf.worker_concurrency
+    ))
+    logger.info("✅ Worker database initialized")
+    try:
+        _loop.run_until_complete(warm_graph())
+    except Exception as e:
+        logger.warning(f"⚠️ Worker warmup failed, first task will be cold: {str(e)}")
+
+
+@worker_process_shutdown.connect
+def close_worker(**kwargs):
+    """Close the worker's database pool"""
+    if _loop is not None:
+        _loop.run_until_complete(db.close())
+        _loop.close()
+
+
+async def _run_batch(payloads: List[Dict]):
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run_one(payload: Dict):
+        async with semaphore:
+            await run_audit(
+                payload["file_path"], payload["thread_id"],
+                document_hash=payload.get("document_hash", "")
+            )
+    
+    results = await asyncio.gather(*[run_one(p) for p in payloads], return_exceptions=True)
+    for payload, result in zip(payloads, results):
+        if isinstance(result, BaseException):
+            logger.error(f"❌ Analysis failed - Thread: {payload['thread_id']}: {str(result)}")
+        else:
+            logger.info(f"✅ Analysis complete - Thread: {payload['thread_id']}")
+
+
+@celery_app.task(name="spendshield.run_graph_batch")
+def run_graph_batch(payloads: List[Dict]):
+    """Run the audit graph for several uploaded documents concurrently"""
+    logger.info(f"📄 Processing {len(payloads)} queued document(s)")
+    with _loop_lock:
+        if _loop is None:
+            init_worker()
+        _loop.run_until_complete(_run_batch(payloads))
+
+
+@celery_app.task(name="spendshield.run_graph")
+def run_graph_task(thread_id: str, file_path: str, document_hash: str = ""):
+    """Run the full audit graph for one uploaded document"""
+    run_graph_batch([{
+        "thread_id": thread_id,
+        "file_path": file_path,
+        "document_hash": document_hash
+    }])
+
+
+class AnalyzeBatcher:
+    """
+    Collect documents queued by the API and publish them in batches
+    
+    submit() returns a future that resolves once the document's batch has
+    reached the broker, or fails with the publish error, so callers only
+    report "queued" for work the broker actually holds
+    """
+    
+    # Queue sentinel asking the collector to publish what it has and exit
+    _STOP = object()
+    
+    def __init__(self, max_batch: int, window: float):
+        self.max_batch = max_batch
+        self.window = window
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop collecting once everything already submitted is published"""
+        if self._task is not None:
+            await self.queue.put(self._STOP)
+            await self._task
+            self._task = None
+    
+    async def submit(self, thread_id: str, file_path: str,
+                     document_hash: str = "") -> asyncio.Future:
+        item = ({
+            "thread_id": thread_id,
+            "file_path": file_path,
+            "document_hash": document_hash
+        }, asyncio.get_running_loop().create_future())
+        if self._task is None:
+            # Not collecting (e.g. during shutdown): publish on its own
+            await self._publish([item])
+        else:
+            await self.queue.put(item)
+        return item[1]
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._publish(batch)
+            if stopping:
+                return
+    
+    async def _publish(self, batch: List[tuple]):
+        # Skip documents whose submitter was cancelled before publishing
+        batch = [(payload, future) for payload, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            # Publishing talks to the broker synchronously
+            await asyncio.to_thread(run_graph_batch.delay, [payload for payload, _ in batch])
+        except Exception as e:
+            logger.error(f"❌ Failed to queue {len(batch)} document(s): {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+
+analyze_batcher = AnalyzeBatcher(BATCH_MAX, BATCH_WINDOW)
@@ -0,0 +1,114 @@
+-- Generated by `python -m app.db > db/seed/seed.sql`; do not edit by hand
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor_id VARCHAR(50) PRIMARY KEY,
+    vendor_name VARCHAR(255) NOT NULL,
+    registration_date DATE NOT NULL,
+    business_type VARCHAR(100),
+    contact_email VARCHAR(255),
+    contact_phone VARCHAR(50),
+    address TEXT,
+    tax_id VARCHAR(50),
+    risk_score FLOAT DEFAULT 0.0,
+    total_contracts INTEGER DEFAULT 0,
+    total_value DECIMAL(15, 2) DEFAULT 0.0,
+    is_blacklisted BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP INDEX IF EXISTS idx_vendor_name;
+CREATE INDEX IF NOT EXISTS idx_vendor_name_trgm ON vendors USING GIN (vendor_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_risk_score ON vendors(risk_score);
+
+CREATE TABLE IF NOT EXISTS past_expenditures (
+    expenditure_id SERIAL PRIMARY KEY,
+    vendor_id VARCHAR(50) REFERENCES vendors(vendor_id),
+    document_type VARCHAR(50) NOT NULL,
+    reference_number VARCHAR(100) UNIQUE NOT NULL,
+    transaction_date DATE NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL,
+    item_description TEXT,
+    quantity INTEGER,
+    unit_price DECIMAL(15, 2),
+    approval_authority VARCHAR(255),
+    department VARCHAR(255),
+    fiscal_year INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP INDEX IF EXISTS idx_vendor_expenditure;
+CREATE INDEX IF NOT EXISTS idx_vendor_txn_date ON past_expenditures
+    (vendor_id, transaction_date DESC)
+    INCLUDE (amount, item_description, unit_price, reference_number, document_type);
+CREATE INDEX IF NOT EXISTS idx_reference_number ON past_expenditures(reference_number);
+DROP INDEX IF EXISTS idx_transaction_date;
+CREATE INDEX IF NOT EXISTS idx_transaction_date_brin ON past_expenditures
+    USING BRIN (transaction_date) WITH (pages_per_range = 32);
+DROP INDEX IF EXISTS idx_item_description;
+CREATE INDEX IF NOT EXISTS idx_item_desc_trgm ON past_expenditures USING GIN (item_description gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS flags (
+    flag_id SERIAL PRIMARY KEY,
+    thread_id VARCHAR(100) NOT NULL,
+    vendor_id VARCHAR(50),
+    reference_number VARCHAR(100),
+    flag_type VARCHAR(50) NOT NULL,
+    severity VARCHAR(20) NOT NULL,
+    description TEXT NOT NULL,
+    evidence JSONB,
+    fraud_risk_score FLOAT,
+    flagged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    reviewed BOOLEAN DEFAULT FALSE,
+    reviewer_notes TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_thread_id ON flags(thread_id);
+CREATE INDEX IF NOT EXISTS idx_flag_type ON flags(flag_type);
+CREATE INDEX IF NOT EXISTS idx_severity ON flags(severity);
+DROP INDEX IF EXISTS idx_flagged_at;
+CREATE INDEX IF NOT EXISTS idx_flagged_at_brin ON flags USING BRIN (flagged_at);
+CREATE INDEX IF NOT EXISTS idx_flags_unreviewed ON flags (thread_id, flagged_at DESC)
+    WHERE reviewed = FALSE;
+
+CREATE TABLE IF NOT EXISTS audit_results (
+    document_hash VARCHAR(64) NOT NULL,
+    prompt_version VARCHAR(20) NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (document_hash, prompt_version)
+);
+
+CREATE TABLE IF NOT EXISTS audit_summary (
+    thread_id VARCHAR(100) PRIMARY KEY,
+    fraud_risk_score FLOAT,
+    anomaly_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_summary_updated ON audit_summary (updated_at DESC);
+
+INSERT INTO audit_summary (thread_id, fraud_risk_score, anomaly_count, updated_at)
+SELECT thread_id, MAX(fraud_risk_score), COUNT(*), MAX(flagged_at)
+FROM flags
+WHERE NOT EXISTS (SELECT 1 FROM audit_summary)
+GROUP BY thread_id;
+
+COPY vendors (vendor_id, vendor_name, registration_date, business_type, contact_email, contact_phone, address, tax_id, risk_score, total_contracts, total_value, is_blacklisted) FROM stdin;
+VND001	Reliable Office Supplies Inc	2020-01-15	Office Supplies	contact@reliableoffice.com	+1-555-0101	123 Business St, Commerce City, ST 12345	TAX-001-2020	0.1	45	250000.0	f
+VND002	TechPro Solutions	2019-06-20	IT Services	info@techpro.com	+1-555-0202	456 Tech Ave, Silicon Valley, ST 54321	TAX-002-2019	0.2	30	500000.0	f
+VND003	Budget Furniture Co	2021-03-10	Furniture	sales@budgetfurniture.com	+1-555-0303	789 Furniture Blvd, Hometown, ST 67890	TAX-003-2021	0.3	20	150000.0	f
+VND004	Shady Enterprises LLC	2024-11-01	General Supplies	contact@shadyent.com	\N	\N	TAX-004-2024	0.8	2	75000.0	f
+\.
+
+COPY past_expenditures (vendor_id, document_type, reference_number, transaction_date, amount, item_description, quantity, unit_price, approval_authority, department, fiscal_year) FROM stdin;
+VND001	invoice	INV-2023-001	2023-01-15	40000.0	Office supplies - paper, pens, folders	1000	40.0	John Smith	Administration	2023
+VND001	invoice	INV-2023-045	2023-06-20	38000.0	Office supplies - paper, pens, folders	1000	38.0	Jane Doe	Administration	2023
+VND001	invoice	INV-2024-012	2024-02-10	42000.0	Office supplies - paper, pens, folders	1000	42.0	John Smith	Administration	2024
+VND002	invoice	INV-2023-078	2023-08-15	120000.0	IT consulting services	1	120000.0	CTO Office	IT	2023
+VND003	invoice	INV-2023-090	2023-09-01	25000.0	Office desks and chairs	50	500.0	Facilities Manager	Facilities	2023
+\.
+
+ANALYZE past_expenditures;
@@ -0,0 +1,126 @@
+"""
+Tests for the database manager's in-process caching in app.db
+"""
+
+import pytest
+
+from app import db as db_module
+from app.db import Database, TTLCache
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.conn.queries += 1
+
+    async def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+    async def fetchall(self):
+        return list(self.conn.rows)
+
+
+class FakeConnection:
+    """Answers every query with the same rows and counts round-trips"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+
+@pytest.mark.asyncio
+async def test_cached_vendor_is_copied_per_caller():
+    db = Database("postgresql://unused")
+    conn = FakeConnection([{"vendor_id": "VND001", "vendor_name": "Reliable"}])
+
+    first = await db.get_vendor_by_id("VND001", conn=conn)
+    first["vendor_name"] = "mutated"
+    second = await db.get_vendor_by_id("VND001", conn=conn)
+
+    assert conn.queries == 1
+    assert second["vendor_name"] == "Reliable"
+
+
+@pytest.mark.asyncio
+async def test_cached_transactions_are_copied_per_caller():
+    db = Database("postgresql://unused")
+    conn = FakeConnection([{"reference_number": "INV-1", "amount": 100}])
+
+    first = await db.get_vendor_transactions("VND001", conn=conn)
+    first[0]["amount"] = 0
+    first.append({"reference_number": "INV-2"})
+    second = await db.get_vendor_transactions("VND001", conn=conn)
+
+    assert conn.queries == 1
+    assert second == [{"reference_number": "INV-1", "amount": 100}]
+
+
+@pytest.mark.asyncio
+async def test_vendor_misses_are_not_cached():
+    db = Database("postgresql://unused")
+    conn = FakeConnection([])
+
+    assert await db.get_vendor_by_name("New Vendor", conn=conn) is None
+    assert await db.get_vendor_transactions("VND009", conn=conn) == []
+
+    conn.rows = [{"vendor_id": "VND009", "vendor_name": "New Vendor"}]
+    assert await db.get_vendor_by_name("New Vendor", conn=conn) == conn.rows[0]
+    assert await db.get_vendor_transactions("VND009", conn=conn) == conn.rows
+    assert conn.queries == 4
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=8, ttl=60)
+    cache.set("key", "value")
+
+    now[0] += 60
+    assert cache.get("key") == (True, "value")
+
+    now[0] += 1
+    assert cache.get("key") == (False, None)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+def test_invalidate_vendor_drops_only_that_vendor():
+    db = Database("postgresql://unused")
+    cache = db._vendor_cache
+    cache.set(('id', 'VND001'), {"vendor_id": "VND001"})
+    cache.set(('name', 'Reliable'), {"vendor_id": "VND001"})
+    cache.set(('transactions', 'VND001', 10), ({"reference_number": "INV-1"},))
+    cache.set(('id', 'VND002'), {"vendor_id": "VND002"})
+    cache.set(('transactions', 'VND002', 10), ({"reference_number": "INV-2"},))
+
+    db.invalidate_vendor('VND001')
+
+    assert not cache.get(('id', 'VND001'))[0]
+    assert not cache.get(('name', 'Reliable'))[0]
+    assert not cache.get(('transactions', 'VND001', 10))[0]
+    assert cache.get(('id', 'VND002'))[0]
+    assert cache.get(('transactions', 'VND002', 10))[0]
+
+    db.invalidate_vendor()
+    assert not cache.get(('id', 'VND002'))[0]
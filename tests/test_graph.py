@@ -0,0 +1,31 @@
+"""
+Tests for the fraud detection graph helpers in app.graph
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.postgres")
+
+from app.graph import _EXTRACT_RE
+
+
+DATA = {"vendor_name": "Reliable Office Supplies Inc", "amount": 1250.5}
+
+
+@pytest.mark.parametrize("block", [
+    json.dumps(DATA),
+    "```json\n" + json.dumps(DATA, indent=2) + "\n```",
+    "```\n" + json.dumps(DATA) + "\n```",
+])
+def test_extract_re_reads_reasoning_and_data(block):
+    response = f"REASONING:\nThe invoice is legible.\n\nEXTRACTED_DATA:\n{block}\n"
+    match = _EXTRACT_RE.search(response)
+    assert match is not None
+    assert match.group(1) == "The invoice is legible."
+    assert json.loads(match.group(2)) == DATA
+
+
+def test_extract_re_needs_both_sections():
+    assert _EXTRACT_RE.search("EXTRACTED_DATA: " + json.dumps(DATA)) is None
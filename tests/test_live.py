@@ -0,0 +1,195 @@
+"""
+Tests for the live application in app.live
+"""
+
+import io
+
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app import live
+from app.live import AnomalyFlag, detect_anomalies, generate_recommendations
+
+
+COMPLETE_INVOICE = {
+    "vendor_name": "Reliable Office Supplies Inc",
+    "vendor_id": "VND001",
+    "invoice_number": "INV-2024-001",
+    "total_amount": 1000.00
+}
+
+
+def test_detect_anomalies_clean_invoice():
+    anomalies, score, flags = detect_anomalies(COMPLETE_INVOICE)
+    assert anomalies == []
+    assert score == 0
+    assert flags == AnomalyFlag(0)
+
+
+@pytest.mark.parametrize("amount, flagged", [
+    (live.HIGH_VALUE_AMOUNT, False),
+    (live.HIGH_VALUE_AMOUNT + 0.01, True),
+])
+def test_detect_anomalies_high_value_boundary(amount, flagged):
+    anomalies, score, flags = detect_anomalies({**COMPLETE_INVOICE, "total_amount": amount})
+    assert bool(flags & AnomalyFlag.HIGH_VALUE) is flagged
+    assert score == (live.HIGH_VALUE_SCORE if flagged else 0)
+    assert [a["flag_type"] for a in anomalies] == (["high_value"] if flagged else [])
+
+
+@pytest.mark.parametrize("missing", [None, ""])
+def test_detect_anomalies_missing_fields(missing):
+    anomalies, score, flags = detect_anomalies({
+        **COMPLETE_INVOICE, "vendor_id": missing, "invoice_number": missing
+    })
+    assert flags == AnomalyFlag.MISSING_VENDOR_ID | AnomalyFlag.MISSING_INVOICE_NUMBER
+    assert score == live.MISSING_VENDOR_ID_SCORE + live.MISSING_INVOICE_NUMBER_SCORE
+    assert [a["flag_type"] for a in anomalies] == ["missing_vendor_id", "missing_invoice_number"]
+
+
+def test_detect_anomalies_missing_amount_is_not_high_value():
+    data = {key: value for key, value in COMPLETE_INVOICE.items() if key != "total_amount"}
+    _, score, flags = detect_anomalies(data)
+    assert score == 0
+    assert flags == AnomalyFlag(0)
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for AnalysisCache's L2 tier"""
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.redis.values[key] = value
+
+    def zadd(self, key, mapping):
+        pass
+
+    def zremrangebyscore(self, key, low, high):
+        pass
+
+    def zremrangebyrank(self, key, start, stop):
+        pass
+
+    async def execute(self):
+        pass
+
+
+def _analysis(thread_id: str) -> dict:
+    return {
+        "thread_id": thread_id,
+        "status": "completed",
+        "fraud_risk_score": 20,
+        "risk_level": "MEDIUM",
+        "anomalies": []
+    }
+
+
+@pytest.mark.asyncio
+async def test_redis_promotion_keeps_analysis_timestamp(monkeypatch):
+    redis = FakeRedis()
+    writer = live.AnalysisCache()
+    writer.redis = redis
+    monkeypatch.setattr(live, "current_timestamp", lambda: "2024-01-01T09:00:00")
+    await writer.add("t1", _analysis("t1"))
+
+    # Another worker promotes the entry from Redis later on
+    reader = live.AnalysisCache()
+    reader.redis = redis
+    monkeypatch.setattr(live, "current_timestamp", lambda: "2024-01-01T10:00:00")
+    assert await reader.get("t1") == _analysis("t1")
+
+    reader.redis = None
+    [summary] = await reader.recent_summaries()
+    assert dict(zip(live.AUDIT_SUMMARY_FIELDS, summary))["timestamp"] == "2024-01-01T09:00:00"
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_evicts_least_recently_used():
+    cache = live.AnalysisCache(max_size=2)
+    await cache.add("a", _analysis("a"))
+    await cache.add("b", _analysis("b"))
+    assert await cache.get("a") is not None
+
+    await cache.add("c", _analysis("c"))
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert [summary[0] for summary in await cache.recent_summaries()] == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(live.time, "monotonic", lambda: now[0])
+    cache = live.AnalysisCache(ttl=60)
+    await cache.add("a", _analysis("a"))
+    await cache.add("b", _analysis("b"))
+
+    now[0] += 59
+    assert await cache.get("a") is not None
+
+    now[0] += 1
+    assert await cache.get("a") is None
+    assert cache.evict_expired() == 1
+    assert len(cache.cache) == 0
+
+
+def test_recommendations_follow_flag_order():
+    flags = AnomalyFlag.HIGH_VALUE | AnomalyFlag.MISSING_VENDOR_ID
+    assert generate_recommendations(flags, 50) == [
+        "⚠️ Hold payment pending review",
+        "📋 Request additional documentation",
+        "✅ Verify vendor registration and credentials",
+        "👤 Require additional approval from senior management",
+        "📊 Cross-check with procurement records"
+    ]
+
+
+def test_recommendations_for_clean_document():
+    assert generate_recommendations(AnomalyFlag(0), 0) == [
+        "✅ Transaction appears normal - proceed with standard approval",
+        "📊 Cross-check with procurement records"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_oversized_content_length_is_rejected_before_parsing():
+    declared = live.Config.MAX_FILE_SIZE + live.MULTIPART_OVERHEAD + 1
+    transport = httpx.ASGITransport(app=live.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/analyze", content=b"", headers={"content-length": str(declared)}
+        )
+    assert response.status_code == 413
+    assert response.json() == {"detail": live._too_large_message()}
+
+
+@pytest.mark.asyncio
+async def test_read_upload_enforces_cap_while_streaming(monkeypatch):
+    monkeypatch.setattr(live.Config, "MAX_FILE_SIZE", 8)
+    monkeypatch.setattr(live, "UPLOAD_CHUNK_SIZE", 4)
+
+    assert await live.read_upload(UploadFile(io.BytesIO(b"12345678"))) == b"12345678"
+    with pytest.raises(HTTPException) as excinfo:
+        await live.read_upload(UploadFile(io.BytesIO(b"123456789")))
+    assert excinfo.value.status_code == 413
@@ -0,0 +1,124 @@
+"""
+Tests for the FastAPI backend in app.main
+"""
+
+import io
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.postgres")
+
+import httpx
+from fastapi import HTTPException, UploadFile
+from langgraph.graph import END
+from starlette.requests import Request
+
+from app import graph as audit_graph
+from app import main
+from app.db import db
+
+
+class FakeGraph:
+    """Serves one fixed checkpoint for every thread"""
+
+    def __init__(self, values: dict):
+        self.values = values
+
+    async def aget_state(self, config):
+        return SimpleNamespace(values=self.values)
+
+
+def _client() -> httpx.AsyncClient:
+    # ASGITransport skips the lifespan, so no database or broker is needed
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_cached_result_replay_reports_completed(tmp_path, monkeypatch):
+    document = tmp_path / "invoice.png"
+    document.write_bytes(b"identical upload")
+    cached = {
+        "extracted_data": {"vendor_id": "VND001", "reference_number": "INV-1"},
+        "anomalies": [],
+        "fraud_risk_score": 10.0,
+        "final_report": "report",
+        "recommendations": ["Proceed"],
+        "current_node": "reporter",
+        "errors": []
+    }
+
+    async def get_cached_result(document_hash, prompt_version, **kwargs):
+        return cached
+
+    async def save_flags(rows, **kwargs):
+        pass
+
+    async def get_flags_by_thread(thread_id, **kwargs):
+        return []
+
+    monkeypatch.setattr(db, "get_cached_result", get_cached_result)
+    monkeypatch.setattr(db, "save_flags", save_flags)
+    monkeypatch.setattr(db, "get_flags_by_thread", get_flags_by_thread)
+
+    state = audit_graph.new_audit_state(str(document), "replayed-thread")
+    update = await audit_graph.extractor_node(state)
+    assert update["cache_hit"]
+    assert audit_graph._route_after_extractor({**state, **update}) == END
+
+    monkeypatch.setattr(main.app.state, "graph", FakeGraph({**state, **update}), raising=False)
+    async with _client() as client:
+        response = await client.get("/audit/replayed-thread")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+
+
+def _request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(key.encode(), value.encode()) for key, value in headers.items()]
+    })
+
+
+def test_etag_response_not_modified():
+    body = b'{"status": "completed"}'
+    response = main.etag_response(_request({}), body)
+    assert response.status_code == 200
+    assert response.body == body
+    etag = response.headers["etag"]
+
+    response = main.etag_response(_request({"if-none-match": etag}), body)
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+
+    assert main.etag_response(_request({"if-none-match": '"stale"'}), body).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_oversized_content_length_is_rejected_before_parsing():
+    declared = main.MAX_UPLOAD_SIZE + main.MULTIPART_OVERHEAD + 1
+    async with _client() as client:
+        response = await client.post(
+            "/analyze", content=b"", headers={"content-length": str(declared)}
+        )
+    assert response.status_code == 413
+    assert response.json() == {"detail": main.TOO_LARGE_DETAIL}
+
+
+@pytest.mark.asyncio
+async def test_save_upload_enforces_cap_while_streaming(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_SIZE", 8)
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 4)
+
+    kept = tmp_path / "kept.png"
+    document_hash = await main.save_upload(UploadFile(io.BytesIO(b"12345678")), str(kept))
+    assert kept.read_bytes() == b"12345678"
+    assert document_hash == audit_graph._hash_document(str(kept))
+
+    dropped = tmp_path / "dropped.png"
+    with pytest.raises(HTTPException) as excinfo:
+        await main.save_upload(UploadFile(io.BytesIO(b"123456789")), str(dropped))
+    assert excinfo.value.status_code == 413
+    assert not dropped.exists()
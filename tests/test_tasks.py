@@ -0,0 +1,71 @@
+"""
+Tests for the Celery producer side in app.tasks
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.postgres")
+
+from app import tasks
+from app.tasks import AnalyzeBatcher
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Batches handed to the broker, in order"""
+    batches = []
+    monkeypatch.setattr(tasks.run_graph_batch, "delay", batches.append)
+    return batches
+
+
+async def _submit(batcher: AnalyzeBatcher, thread_id: str) -> asyncio.Future:
+    return await batcher.submit(thread_id, f"uploads/{thread_id}.png", f"hash-{thread_id}")
+
+
+@pytest.mark.asyncio
+async def test_documents_within_window_share_a_batch(published):
+    batcher = AnalyzeBatcher(max_batch=8, window=0.05)
+    batcher.start()
+    futures = [await _submit(batcher, "a"), await _submit(batcher, "b")]
+
+    await asyncio.wait_for(asyncio.gather(*futures), 1)
+    await batcher.stop()
+
+    assert published == [[
+        {"thread_id": "a", "file_path": "uploads/a.png", "document_hash": "hash-a"},
+        {"thread_id": "b", "file_path": "uploads/b.png", "document_hash": "hash-b"}
+    ]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_published_without_waiting_for_window(published):
+    batcher = AnalyzeBatcher(max_batch=2, window=10)
+    batcher.start()
+    futures = [await _submit(batcher, thread_id) for thread_id in ("a", "b", "c")]
+
+    # The first two fill a batch and go out long before the window closes
+    await asyncio.wait_for(asyncio.gather(*futures[:2]), 1)
+    assert not futures[2].done()
+
+    # Stopping flushes whatever is still collecting
+    await batcher.stop()
+    await futures[2]
+    assert [[p["thread_id"] for p in batch] for batch in published] == [["a", "b"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_publish_failure_reaches_every_submitter(monkeypatch):
+    def refuse(payloads):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(tasks.run_graph_batch, "delay", refuse)
+    batcher = AnalyzeBatcher(max_batch=8, window=0.01)
+    batcher.start()
+    futures = [await _submit(batcher, "a"), await _submit(batcher, "b")]
+
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(future, 1)
+    await batcher.stop()